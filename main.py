@@ -1,33 +1,78 @@
 import os
 import sys
 import json
+import hashlib
 import datetime
 import math
+import threading
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import chain
+from typing import NamedTuple
 from decimal import Decimal, InvalidOperation
-import tempfile
 
 
 # SQLAlchemy
 from sqlalchemy import (create_engine, Column, Integer, String, Date, DateTime,
-                        Float, Boolean, ForeignKey, func, Index, and_, or_)
-from sqlalchemy.orm import declarative_base, relationship, sessionmaker
+                        Float, Boolean, ForeignKey, func, Index, and_, or_,
+                        select, bindparam, event, union_all, literal, text,
+                        tuple_)
+from sqlalchemy.orm import declarative_base, relationship, sessionmaker, scoped_session, joinedload
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 # CLI / UI
 from rich.console import Console
 from rich.table import Table
 from rich.prompt import Prompt, Confirm
 from rich.panel import Panel
+from rich.text import Text
 from rich import box
 
 # Exports & charts
 from openpyxl import Workbook
 from fpdf import FPDF
-import matplotlib.pyplot as plt
-
-# Optional encryption
-from cryptography.fernet import Fernet, InvalidToken
+from PIL import Image, ImageDraw
+
+# Optional accelerator: Rust-backed JSON encoder for history snapshots
+try:
+    import orjson
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:
+    def _dumps(obj) -> str:
+        return json.dumps(obj)
+
+# Optional encryption — prefer the Rust port (rfernet) when installed; it is
+# several times faster per token on the small payloads typical of notes.
+from cryptography.fernet import InvalidToken
+try:
+    from rfernet import Fernet as _RustFernet
+
+    class Fernet:
+        """Present rfernet through cryptography.Fernet's bytes API.
+
+        rfernet wants a str key, encrypts bytes to a str token and
+        decrypts a str token to bytes; the call sites (and tokens
+        already stored in the DB) follow cryptography's bytes-in/
+        bytes-out shape, so the conversions live here instead of in
+        every caller.
+        """
+
+        def __init__(self, key):
+            self._fernet = _RustFernet(key.decode() if isinstance(key, bytes) else key)
+
+        def encrypt(self, data: bytes) -> bytes:
+            return self._fernet.encrypt(data).encode()
+
+        def decrypt(self, token) -> bytes:
+            if isinstance(token, bytes):
+                token = token.decode()
+            return self._fernet.decrypt(token)
+except ImportError:
+    from cryptography.fernet import Fernet
 
 # ---------- Configuration ----------
 DB_FILE = "expenses.db"  # chosen option 3-A
@@ -37,10 +82,36 @@ FERNET_KEY = os.getenv("EXPENSE_KEY")  # must be a 32 url-safe base64 key if enc
 # ---------- Setup Console ----------
 console = Console()
 
+# Static messages parsed once at import — Rich re-runs its markup parser
+# on every print of a plain string.
+_MSG_NO_ITEMS = Text.from_markup("[yellow]No items[/yellow]")
+_MSG_NO_DATA = Text.from_markup("[yellow]No data to export.[/yellow]")
+_MSG_NO_RESULTS = Text.from_markup("[yellow]No results[/yellow]")
+_MSG_ID_NOT_FOUND = Text.from_markup("[red]ID not found[/red]")
+_MSG_INVALID_AMOUNT = Text.from_markup("[red]Invalid amount[/red]")
+_MSG_BYE = Text.from_markup("[green]Goodbye[/green]")
+_MENU_PANEL = Panel("Expense Manager PRO (SQLite + SQLAlchemy)", style="bold white on blue")
+
 # ---------- Database Setup ----------
 Base = declarative_base()
-engine = create_engine(f"sqlite:///{DB_FILE}", echo=False, future=True)
-SessionLocal = sessionmaker(bind=engine)
+engine = create_engine(f"sqlite:///{DB_FILE}", echo=False, future=True,
+                       execution_options={"compiled_cache": {}},
+                       connect_args={"check_same_thread": False})
+# Thread-local session registry; expire_on_commit=False keeps loaded
+# objects usable after commit without a refresh round-trip per attribute.
+SessionLocal = scoped_session(sessionmaker(bind=engine, expire_on_commit=False))
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_conn, connection_record):
+    """Apply performance PRAGMAs once per physical connection."""
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA cache_size=-64000")
+    cur.execute("PRAGMA mmap_size=268435456")
+    cur.close()
 
 # ---------- Encryption helper ----------
 fernet = None
@@ -50,36 +121,80 @@ if ENCRYPT_NOTES:
         ENCRYPT_NOTES = False
     else:
         try:
-            if ENCRYPT_NOTES:
-                if not FERNET_KEY or len(FERNET_KEY.encode()) != 44:
-                    console.print("[red]Invalid EXPENSE_KEY, disabling encryption[/red]")
-                    ENCRYPT_NOTES = False
-                else:
-                    fernet = Fernet(FERNET_KEY.encode())
-
+            fernet = Fernet(FERNET_KEY.encode())
         except Exception:
-            console.print("[red]Invalid EXPENSE_KEY. Disable encryption or supply a valid key.[/red]")
-            ENCRYPT_NOTES = False
+            # a bad key must not fall through to plaintext storage
+            console.print("[red]Invalid EXPENSE_KEY. Fix the key or unset EXPENSE_ENCRYPT_NOTES.[/red]")
+            sys.exit(1)
 
 def encrypt_note(plain: str) -> str:
     if not ENCRYPT_NOTES or not plain:
         return plain or ""
     return fernet.encrypt(plain.encode()).decode()
 
-def decrypt_note(token: str) -> str:
-    if not ENCRYPT_NOTES or not token:
-        return token or ""
+@lru_cache(maxsize=4096)
+def _decrypt_token(token: str) -> str:
     try:
         return fernet.decrypt(token.encode()).decode()
-    except InvalidToken:
+    except Exception:  # InvalidToken, or rfernet's own error type
         return "[decryption failed]"
-def valid_date_str(date_str: str) -> bool:
-    """Validate date format YYYY-MM-DD"""
+
+def decrypt_note(token: str) -> str:
+    if not ENCRYPT_NOTES or not token:
+        return token or ""
+    return _decrypt_token(token)
+
+# Specialize the per-row display transform once at import so row loops do
+# not re-test ENCRYPT_NOTES (the flag is fixed for the process lifetime).
+if ENCRYPT_NOTES:
+    def _note_view(token):
+        return _decrypt_token(token) if token else ""
+else:
+    def _note_view(token):
+        return token or ""
+
+def batch_decrypt(tokens):
+    """Decrypt an iterable of stored note values for display in one pass.
+
+    Tokens are memoized, so repeated notes (common for recurring expenses)
+    only pay the Fernet cost once per process.
+    """
+    return [_note_view(t) for t in tokens]
+def to_cents(value) -> int:
+    """Convert a rupee amount to integer paise for storage."""
+    return int(round(float(value) * 100))
+
+def from_cents(cents) -> float:
+    """Convert stored integer paise back to rupees for display."""
+    return (cents or 0) / 100.0
+
+def month_bounds(d: datetime.date):
+    """Return (first_day, last_day) of the month containing d."""
+    first = d.replace(day=1)
+    next_month = (first.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return first, next_month - datetime.timedelta(days=1)
+
+def parse_ymd(s: str) -> datetime.date:
+    """Parse a YYYY-MM-DD string.
+
+    strptime re-walks the format string on every call; for this one fixed
+    layout, plain slicing is several times faster on the insert/search paths.
+    """
+    return datetime.date(int(s[0:4]), int(s[5:7]), int(s[8:10]))
+
+def valid_date_str(date_str: str):
+    """Return the normalized YYYY-MM-DD string, or None if invalid.
+
+    Shape is checked with three cheap comparisons before any int() call;
+    no regex or strptime machinery on this per-prompt path. Returning the
+    string (not a bool) lets callers use the validated value directly.
+    """
+    if len(date_str) != 10 or date_str[4] != '-' or date_str[7] != '-':
+        return None
     try:
-        datetime.datetime.strptime(date_str, "%Y-%m-%d")
-        return True
+        return parse_ymd(date_str).isoformat()
     except ValueError:
-        return False
+        return None
 
 
 # ---------- Models ----------
@@ -103,7 +218,11 @@ class Budget(Base):
 class Expense(Base):
     __tablename__ = "expenses"
     id = Column(Integer, primary_key=True)
-    amount = Column(Float, nullable=False, index=True)
+    # canonical amount in integer paise: exact arithmetic, smaller rows,
+    # faster integer SUM. The legacy float column is still written so old
+    # tooling can read the DB.
+    amount_cents = Column(Integer, nullable=False, server_default=text("0"), index=True)
+    amount = Column(Float, nullable=False, index=True)  # legacy, rupees
     currency = Column(String(8), default="INR")
     note = Column(String, nullable=True)  # can be encrypted
     date = Column(Date, index=True, default=datetime.date.today)
@@ -113,8 +232,14 @@ class Expense(Base):
 
     category_obj = relationship("Category", back_populates="expenses")
 
-    # index composite for frequent queries
-Index('ix_expense_date_amount', Expense.date, Expense.amount)
+    # composite indexes for the frequent aggregate filters: the monthly
+    # category SUM can be answered from ix_expense_live_cat_date_amt alone
+    # (index-only scan), and the trend/date-range queries from ix_expense_live_date
+Index('ix_expense_live_cat_date_amt',
+      Expense.deleted, Expense.category_id, Expense.date, Expense.amount_cents)
+Index('ix_expense_live_date_cat', Expense.deleted, Expense.date, Expense.category_id)
+# covers the keyset-pagination predicate (date, id) < (?, ?)
+Index('ix_expense_date_id', Expense.date, Expense.id)
 
 class ExpenseHistory(Base):
     __tablename__ = "expense_history"
@@ -124,60 +249,205 @@ class ExpenseHistory(Base):
     snapshot = Column(String)  # JSON snapshot
     timestamp = Column(DateTime, default=datetime.datetime.utcnow)
 
+# ---------- Prepared statements (built once, reused on every call) ----------
+_STMT_MONTH_CAT_SUM = select(func.sum(Expense.amount_cents)).where(
+    Expense.deleted == False,
+    Expense.category_id == bindparam("cid"),
+    Expense.date.between(bindparam("s"), bindparam("e")))
+
+_STMT_MONTH_SUM = select(func.sum(Expense.amount_cents)).where(
+    Expense.deleted == False,
+    Expense.date.between(bindparam("s"), bindparam("e")))
+
+_STMT_TREND = select(Expense.date, func.sum(Expense.amount_cents)).where(
+    Expense.deleted == False,
+    Expense.date.between(bindparam("s"), bindparam("e"))
+).group_by(Expense.date).order_by(Expense.date)
+
+_STMT_MONTHLY_TOTALS = select(
+    func.strftime("%Y-%m", Expense.date).label("month"),
+    func.sum(Expense.amount_cents)
+).where(
+    Expense.deleted == False,
+    Expense.date.between(bindparam("s"), bindparam("e"))
+).group_by(text("month")).order_by(text("month"))
+
 # A simple schema version row for manual migrations
 class MetaInfo(Base):
     __tablename__ = "meta_info"
     key = Column(String(50), primary_key=True)
     value = Column(String(200))
 
+# category_id -> monthly budget amount (rupees). Budgets change rarely, so
+# they are loaded once at startup and refreshed when the user edits one,
+# saving a SELECT on every expense insert.
+_BUDGET_CACHE = {}
+
+# True when the expense_fts virtual table is usable for keyword search
+_FTS_ENABLED = False
+
+
+def _init_fts() -> bool:
+    """Create the FTS5 note index (external-content) and its sync triggers.
+
+    Keyword search over notes was a LIKE '%kw%' full scan; an FTS5 table
+    backed by the expenses table answers it from an inverted index. The
+    triggers keep the index in step with inserts, note updates and hard
+    deletes. Skipped entirely when notes are encrypted (the index would
+    only see ciphertext) or when sqlite lacks FTS5 — callers fall back
+    to LIKE.
+    """
+    if ENCRYPT_NOTES:
+        return False
+    try:
+        with engine.begin() as conn:
+            fresh = not conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='expense_fts'"
+            ).fetchone()
+            conn.exec_driver_sql(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS expense_fts USING fts5("
+                "note, content='expenses', content_rowid='id')")
+            conn.exec_driver_sql(
+                "CREATE TRIGGER IF NOT EXISTS expense_fts_ai AFTER INSERT ON expenses BEGIN"
+                " INSERT INTO expense_fts(rowid, note) VALUES (new.id, new.note);"
+                " END")
+            conn.exec_driver_sql(
+                "CREATE TRIGGER IF NOT EXISTS expense_fts_ad AFTER DELETE ON expenses BEGIN"
+                " INSERT INTO expense_fts(expense_fts, rowid, note)"
+                " VALUES ('delete', old.id, old.note);"
+                " END")
+            conn.exec_driver_sql(
+                "CREATE TRIGGER IF NOT EXISTS expense_fts_au AFTER UPDATE OF note ON expenses BEGIN"
+                " INSERT INTO expense_fts(expense_fts, rowid, note)"
+                " VALUES ('delete', old.id, old.note);"
+                " INSERT INTO expense_fts(rowid, note) VALUES (new.id, new.note);"
+                " END")
+            if fresh:
+                # index pre-existing rows once
+                conn.exec_driver_sql("INSERT INTO expense_fts(expense_fts) VALUES ('rebuild')")
+        return True
+    except Exception:
+        return False
+
+
 # Create tables if not present
 def init_db():
     Base.metadata.create_all(bind=engine)
-    # set schema version if missing
+    # set schema version if missing, migrate old layouts forward
     session = SessionLocal()
     try:
         v = session.get(MetaInfo, "schema_version")
         if not v:
-            session.add(MetaInfo(key="schema_version", value="1"))
+            session.add(MetaInfo(key="schema_version", value="4"))
+            session.commit()
+        elif int(v.value) < 4:
+            with engine.begin() as conn:
+                if int(v.value) < 2:
+                    # v1 predates the integer-cents amount column
+                    cols = [r[1] for r in conn.exec_driver_sql("PRAGMA table_info(expenses)")]
+                    if "amount_cents" not in cols:
+                        conn.exec_driver_sql(
+                            "ALTER TABLE expenses ADD COLUMN amount_cents INTEGER NOT NULL DEFAULT 0")
+                    conn.exec_driver_sql(
+                        "UPDATE expenses SET amount_cents = CAST(ROUND(amount*100) AS INTEGER)")
+                    conn.exec_driver_sql(
+                        "CREATE INDEX IF NOT EXISTS ix_expenses_amount_cents ON expenses (amount_cents)")
+                    conn.exec_driver_sql(
+                        "CREATE INDEX IF NOT EXISTS ix_expense_date_id ON expenses (date, id)")
+                # v2 -> v3: swap the (date, amount) index for covering composites
+                conn.exec_driver_sql("DROP INDEX IF EXISTS ix_expense_date_amount")
+                conn.exec_driver_sql(
+                    "CREATE INDEX IF NOT EXISTS ix_expense_live_cat_date_amt"
+                    " ON expenses (deleted, category_id, date, amount_cents)")
+                # v3 -> v4: date-range index also carries category_id
+                conn.exec_driver_sql("DROP INDEX IF EXISTS ix_expense_live_date")
+                conn.exec_driver_sql(
+                    "CREATE INDEX IF NOT EXISTS ix_expense_live_date_cat"
+                    " ON expenses (deleted, date, category_id)")
+            v.value = "4"
             session.commit()
+        # warm the budget cache: ascending created_at so the newest
+        # budget per category wins
+        for cid, amt in session.query(Budget.category_id, Budget.amount)\
+                               .order_by(Budget.created_at).all():
+            _BUDGET_CACHE[cid] = amt
     except Exception:
         session.rollback()
     finally:
         session.close()
+    global _FTS_ENABLED
+    _FTS_ENABLED = _init_fts()
 
 init_db()
 
+# One long-lived session for the whole CLI process. Opening/closing a
+# session per operation forced a connection checkout (and PRAGMA/statement
+# cache warm-up) on every menu action; helpers fall back to this singleton
+# when no session is passed in.
+SESSION = SessionLocal()
+
 # ---------- Utility DB functions ----------
+# name (lowercased) -> id, so repeated inserts against the same category
+# skip the DB entirely after the first resolution. Reads are lock-free;
+# the lock only guards the resolve-and-store path so concurrent export
+# threads cannot race duplicate upserts.
+_CATEGORY_IDS = {}
+_CATEGORY_IDS_LOCK = threading.Lock()
+
 def create_category_if_missing(session, name: str):
     name = name.strip().title()
-    cat = session.query(Category).filter(func.lower(Category.name) == name.lower()).first()
-    if not cat:
-        cat = Category(name=name)
-        session.add(cat)
-        session.commit()
-    return cat
+    cid = _CATEGORY_IDS.get(name.lower())
+    if cid is None:
+        with _CATEGORY_IDS_LOCK:
+            cid = _CATEGORY_IDS.get(name.lower())
+            if cid is None:
+                # atomic upsert: one round trip whether or not the row exists
+                stmt = sqlite_insert(Category).values(name=name)\
+                    .on_conflict_do_nothing(index_elements=["name"])\
+                    .returning(Category.id)
+                cid = session.execute(stmt).scalar()
+                if cid is None:  # already existed (possibly with different casing)
+                    cid = session.execute(
+                        select(Category.id).where(func.lower(Category.name) == name.lower())
+                    ).scalar()
+                session.commit()
+                _CATEGORY_IDS[name.lower()] = cid
+    return session.get(Category, cid)
+
+def _snapshot_json(expense_obj) -> str:
+    snapshot = {
+        "id": expense_obj.id,
+        "amount": expense_obj.amount,
+        "currency": expense_obj.currency,
+        "note": expense_obj.note,
+        "date": expense_obj.date.isoformat() if expense_obj.date else None,
+        "category_id": expense_obj.category_id,
+        "deleted": bool(expense_obj.deleted),
+        "created_at": expense_obj.created_at.isoformat() if expense_obj.created_at else None
+    }
+    return _dumps(snapshot)
+
+def _history_row(expense_obj, action: str) -> ExpenseHistory:
+    return ExpenseHistory(expense_id=expense_obj.id, action=action,
+                          snapshot=_snapshot_json(expense_obj))
 
 def add_history(session, expense_obj, action: str):
-    try:
-        snapshot = {
-            "id": expense_obj.id,
-            "amount": expense_obj.amount,
-            "currency": expense_obj.currency,
-            "note": expense_obj.note,
-            "date": expense_obj.date.isoformat() if expense_obj.date else None,
-            "category_id": expense_obj.category_id,
-            "deleted": bool(expense_obj.deleted),
-            "created_at": expense_obj.created_at.isoformat() if expense_obj.created_at else None
-        }
-        hist = ExpenseHistory(expense_id=expense_obj.id, action=action, snapshot=json.dumps(snapshot))
-        session.add(hist)
-        session.commit()
-    except Exception:
-        session.rollback()
+    """Queue a history row on the session; the caller's commit persists it
+    together with the mutation in one transaction (one fsync, not two)."""
+    session.add(_history_row(expense_obj, action))
+
+def add_history_bulk(session, expense_objs, action: str):
+    """Bulk-insert history rows for many expenses in a single statement."""
+    if expense_objs:
+        session.execute(
+            ExpenseHistory.__table__.insert(),
+            [{"expense_id": e.id, "action": action,
+              "snapshot": _snapshot_json(e)}
+             for e in expense_objs])
 
 # ---------- Core operations ----------
-def add_expense_db(amount: float, note: str, date_str: str, category_name: str, currency: str = "INR"):
-    session = SessionLocal()
+def add_expense_db(amount: float, note: str, date_str: str, category_name: str, currency: str = "INR", session=None):
+    session = session or SESSION
     try:
         # validate
         try:
@@ -191,7 +461,7 @@ def add_expense_db(amount: float, note: str, date_str: str, category_name: str,
 
         # date
         if date_str and valid_date_str(date_str):
-            date_obj = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+            date_obj = parse_ymd(date_str)
         else:
             date_obj = datetime.date.today()
             if date_str:
@@ -205,91 +475,181 @@ def add_expense_db(amount: float, note: str, date_str: str, category_name: str,
         # encrypt note if enabled
         note_stored = encrypt_note(note) if ENCRYPT_NOTES else (note or "")
 
-        expense = Expense(amount=round(amount_v, 2),
+        # budget alert: read the prior month total once, before inserting,
+        # and include this expense arithmetically — avoids a second SUM query
+        budget_amount = _BUDGET_CACHE.get(cat.id) if cat else None
+        total_cents = None
+        amount_cents = to_cents(amount_v)
+        if budget_amount is not None:
+            month_start, month_end = month_bounds(date_obj)
+            prior = session.execute(
+                _STMT_MONTH_CAT_SUM,
+                {"cid": cat.id, "s": month_start, "e": month_end}
+            ).scalar() or 0
+            total_cents = prior + amount_cents
+
+        expense = Expense(amount_cents=amount_cents,
+                          amount=round(amount_v, 2),
                           currency=currency or "INR",
                           note=note_stored,
                           date=date_obj,
                           category_id=cat.id if cat else None)
         session.add(expense)
-        session.commit()
-
+        session.flush()  # assign expense.id without committing yet
         add_history(session, expense, "create")
+        session.commit()  # expense + history land in one transaction / fsync
 
-        # budget alert (check monthly total for that category)
-        if cat:
-            budget = session.query(Budget).filter(Budget.category_id == cat.id).order_by(Budget.created_at.desc()).first()
-            if budget:
-                # calculate month total including this expense
-                month_start = date_obj.replace(day=1)
-                import calendar  # add at top with imports if not present
-                last_day = calendar.monthrange(date_obj.year, date_obj.month)[1]
-                month_end = date_obj.replace(day=last_day)
-
-                total = session.query(func.sum(Expense.amount)).filter(
-                    Expense.category_id == cat.id,
-                    Expense.deleted == False,
-                    Expense.date >= month_start,
-                    Expense.date <= month_end
-                ).scalar() or 0.0
-                if total >= budget.amount:
-                    console.print(f"[red]⚠ Budget exceeded for category {cat.name} (budget ₹{budget.amount:.2f})[/red]")
-                elif total >= 0.8 * budget.amount:
-                    console.print(f"[yellow]⚠ Approaching budget for {cat.name}: {total:.2f}/ {budget.amount:.2f}[/yellow]")
+        if total_cents is not None:
+            budget_cents = to_cents(budget_amount)
+            if total_cents >= budget_cents:
+                console.print(f"[red]⚠ Budget exceeded for category {cat.name} (budget ₹{budget_amount:.2f})[/red]")
+            elif total_cents >= 0.8 * budget_cents:
+                console.print(f"[yellow]⚠ Approaching budget for {cat.name}: {from_cents(total_cents):.2f}/ {budget_amount:.2f}[/yellow]")
 
         console.print("[green]✔ Expense saved (id: %s)[/green]" % expense.id)
     except SQLAlchemyError as e:
         session.rollback()
         console.print(f"[red]DB Error: {e}[/red]")
-    finally:
-        session.close()
 
-def view_expenses_db(page:int=1, per_page:int=20, sort_by:str="date", desc:bool=True, include_deleted:bool=False):
-    session = SessionLocal()
+class ExpenseRow(NamedTuple):
+    """One listed expense, ready for display/export.
+
+    A NamedTuple instead of a dict: ~3x fewer bytes per row, which matters
+    when export paths hold 10k rows at once. Field order matches
+    EXPORT_HEADERS so the first six fields can be written out directly.
+    """
+    id: int
+    amount: float
+    currency: str
+    category: str
+    date: str
+    note: str
+    deleted: bool = False
+
+def add_expenses_bulk(rows, session=None):
+    """Insert many expenses in one transaction.
+
+    `rows` is an iterable of dicts with amount, note, date_str,
+    category_name and optional currency (the add_expense_db arguments).
+    Categories are resolved once per distinct name, the expenses are
+    flushed as a single batched INSERT, history snapshots go in via one
+    executemany, and everything commits together — ~2 statements instead
+    of 3 round trips per row. Returns the number of rows inserted.
+    """
+    session = session or SESSION
+    try:
+        prepared = []
+        for r in rows:
+            try:
+                amount_v = float(r["amount"])
+            except (KeyError, ValueError, TypeError):
+                continue
+            if amount_v <= 0:
+                continue
+            date_str = r.get("date_str") or ""
+            date_obj = parse_ymd(date_str) if valid_date_str(date_str) else datetime.date.today()
+            prepared.append((amount_v, r.get("note") or "", date_obj,
+                             (r.get("category_name") or "").strip(),
+                             r.get("currency") or "INR"))
+        if not prepared:
+            return 0
+
+        # resolve each distinct category once (cached after first use)
+        cat_ids = {name: create_category_if_missing(session, name).id
+                   for name in {p[3] for p in prepared if p[3]}}
+
+        expenses = [Expense(amount_cents=to_cents(a),
+                            amount=round(a, 2),
+                            currency=curr,
+                            note=encrypt_note(n) if ENCRYPT_NOTES else n,
+                            date=d,
+                            category_id=cat_ids.get(cname))
+                    for a, n, d, cname, curr in prepared]
+        session.add_all(expenses)
+        session.flush()  # batched INSERT, ids assigned
+        add_history_bulk(session, expenses, "create")
+        session.commit()
+        console.print(f"[green]✔ {len(expenses)} expenses saved[/green]")
+        return len(expenses)
+    except SQLAlchemyError as e:
+        session.rollback()
+        console.print(f"[red]DB Error: {e}[/red]")
+        return 0
+
+def view_expenses_db(page:int=1, per_page:int=20, sort_by:str="date", desc:bool=True, include_deleted:bool=False, after=None, session=None):
+    """List a page of expenses.
+
+    For the default date ordering, `after=(date_iso, id)` selects the page
+    following that keyset token instead of OFFSET, so deep pages do not pay
+    for scanning and discarding all preceding rows. On keyset pages `total`
+    and `pages` are None — the fused count would only see rows past the
+    token; callers should keep the total from the first (token-less) page.
+    """
+    session = session or SESSION
     try:
-        q = session.query(Expense)
+        q = session.query(Expense).options(joinedload(Expense.category_obj))
         if not include_deleted:
             q = q.filter(Expense.deleted == False)
         if sort_by == "date":
-            q = q.order_by(Expense.date.desc() if desc else Expense.date)
+            # id tiebreaker keeps the order (and any keyset token) stable
+            q = q.order_by(Expense.date.desc(), Expense.id.desc()) if desc \
+                else q.order_by(Expense.date, Expense.id)
+            if after:
+                key = (parse_ymd(after[0]), after[1])
+                pair = tuple_(Expense.date, Expense.id)
+                q = q.filter(pair < key if desc else pair > key)
         elif sort_by == "amount":
-            q = q.order_by(Expense.amount.desc() if desc else Expense.amount)
+            q = q.order_by(Expense.amount_cents.desc() if desc else Expense.amount_cents)
         elif sort_by == "id":
             q = q.order_by(Expense.id.desc() if desc else Expense.id)
 
-        total = q.count()
-        pages = math.ceil(total / per_page) if per_page else 1
-        items = q.offset((page-1)*per_page).limit(per_page).all()
+        if after and sort_by == "date":
+            # no fused count here: the window would run after the keyset
+            # predicate and report only the rows past the token
+            items = q.limit(per_page).all()
+            total = None
+            pages = None
+        else:
+            # fetch the page and the filtered total in one scan via COUNT() OVER()
+            q = q.add_columns(func.count().over().label("total_cnt"))
+            page_rows = q.offset((page-1)*per_page).limit(per_page).all()
+            items = [r[0] for r in page_rows]
+            if page_rows:
+                total = page_rows[0][1]
+            else:
+                # page past the end: fall back to an explicit count
+                total = q.count() if page > 1 else 0
+            pages = math.ceil(total / per_page) if per_page else 1
 
-        # prepare rows
+        # prepare rows (category eager-loaded, notes decrypted in one batch)
         rows = []
-        for e in items:
-            cat = None
-            if e.category_id:
-                cat_obj = session.get(Category, e.category_id)
-                cat = cat_obj.name if cat_obj else ""
-            note = decrypt_note(e.note) if ENCRYPT_NOTES else (e.note or "")
-            rows.append({
-                "id": e.id, "amount": e.amount, "currency": e.currency,
-                "category": cat, "date": e.date.isoformat() if e.date else "", "note": note, "deleted": e.deleted
-            })
-        return {"total": total, "pages": pages, "page": page, "per_page": per_page, "items": rows}
+        notes = batch_decrypt(e.note for e in items)
+        for e, note in zip(items, notes):
+            cat = e.category_obj.name if e.category_obj else ""
+            rows.append(ExpenseRow(e.id, from_cents(e.amount_cents), e.currency,
+                                   cat, e.date.isoformat() if e.date else "",
+                                   note, e.deleted))
+        next_after = None
+        if sort_by == "date" and items and len(items) == per_page:
+            last = items[-1]
+            next_after = (last.date.isoformat() if last.date else "", last.id)
+        return {"total": total, "pages": pages, "page": page, "per_page": per_page,
+                "items": rows, "next_after": next_after}
     except SQLAlchemyError as exc:
         console.print(f"[red]DB error: {exc}[/red]")
         return {"total":0,"pages":0,"page":1,"per_page":per_page,"items":[]}
-    finally:
-        session.close()
 
-def delete_expense_db(eid:int, soft=True):
-    session = SessionLocal()
+def delete_expense_db(eid:int, soft=True, session=None):
+    session = session or SESSION
     try:
         e = session.get(Expense, eid)
         if not e:
-            console.print("[red]ID not found[/red]")
+            console.print(_MSG_ID_NOT_FOUND)
             return
         if soft:
             e.deleted = True
-            session.commit()
             add_history(session, e, "delete")
+            session.commit()
             console.print(f"[green]Soft-deleted ID {eid}[/green]")
         else:
             session.delete(e)
@@ -298,22 +658,21 @@ def delete_expense_db(eid:int, soft=True):
     except SQLAlchemyError as exc:
         session.rollback()
         console.print(f"[red]DB error: {exc}[/red]")
-    finally:
-        session.close()
 
-def update_expense_db(eid:int, amount=None, note=None, date_str=None, category_name=None, currency=None):
-    session = SessionLocal()
+def update_expense_db(eid:int, amount=None, note=None, date_str=None, category_name=None, currency=None, session=None):
+    session = session or SESSION
     try:
         e = session.get(Expense, eid)
         if not e:
-            console.print("[red]ID not found[/red]")
+            console.print(_MSG_ID_NOT_FOUND)
             return
-        old_snapshot = json.dumps({
+        old_snapshot = _dumps({
             "amount": e.amount, "note": e.note, "date": e.date.isoformat() if e.date else None,
             "category_id": e.category_id, "currency": e.currency
         })
         changed = False
         if amount is not None:
+            e.amount_cents = to_cents(amount)
             e.amount = float(amount)
             changed = True
         if note is not None:
@@ -321,7 +680,7 @@ def update_expense_db(eid:int, amount=None, note=None, date_str=None, category_n
             changed = True
         if date_str:
             try:
-                e.date = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+                e.date = parse_ymd(date_str)
                 changed = True
             except Exception:
                 console.print("[yellow]Invalid date ignored[/yellow]")
@@ -333,111 +692,199 @@ def update_expense_db(eid:int, amount=None, note=None, date_str=None, category_n
             e.currency = currency
             changed = True
         if changed:
-            session.commit()
             add_history(session, e, "update")
+            session.commit()
             console.print("[green]Updated[/green]")
         else:
             console.print("[yellow]No changes made[/yellow]")
     except SQLAlchemyError as exc:
         session.rollback()
         console.print(f"[red]DB error: {exc}[/red]")
-    finally:
-        session.close()
 
 # ---------- Search / Filters ----------
 def search_expenses(keyword: str = None, amount_min: float=None, amount_max:float=None,
                     date_from: str=None, date_to: str=None, category: str=None,
-                    page:int=1, per_page:int=20):
-    session = SessionLocal()
+                    page:int=1, per_page:int=20, stream:bool=False,
+                    with_total:bool=False, session=None):
+    """Filtered expense listing.
+
+    `total`/`pages` are only computed when with_total=True — the export
+    and filter paths never read them, so by default the query skips the
+    COUNT() OVER() window column entirely.
+
+    With stream=True, `items` is a lazy generator over a server-side
+    cursor (yield_per) instead of a materialized list, and no total is
+    computed — peak memory stays at one batch however large the export.
+    """
+    session = session or SESSION
     try:
-        q = session.query(Expense).filter(Expense.deleted==False)
+        q = session.query(Expense).options(joinedload(Expense.category_obj)).filter(Expense.deleted==False)
         if keyword:
             term = f"%{keyword}%"
             # search in note (encrypted notes can't be searched reliably if encrypted)
             if ENCRYPT_NOTES:
                 console.print("[yellow]Note searching disabled when notes are encrypted.[/yellow]")
+            elif _FTS_ENABLED:
+                # prefix match against the inverted index instead of a
+                # LIKE '%kw%' scan; quotes escaped for FTS query syntax
+                match = '"{}"*'.format(keyword.replace('"', '""'))
+                fts_ids = select(text("rowid")).select_from(text("expense_fts")).where(
+                    text("expense_fts MATCH :fts_kw").bindparams(fts_kw=match))
+                q = q.filter(Expense.id.in_(fts_ids))
             else:
                 q = q.filter(Expense.note.ilike(term))
         if amount_min is not None:
-            q = q.filter(Expense.amount >= amount_min)
+            q = q.filter(Expense.amount_cents >= to_cents(amount_min))
         if amount_max is not None:
-            q = q.filter(Expense.amount <= amount_max)
+            q = q.filter(Expense.amount_cents <= to_cents(amount_max))
         if date_from:
             try:
-                dfrom = datetime.datetime.strptime(date_from, "%Y-%m-%d").date()
-                q = q.filter(Expense.date >= dfrom)
+                q = q.filter(Expense.date >= parse_ymd(date_from))
             except Exception:
                 pass
         if date_to:
             try:
-                dto = datetime.datetime.strptime(date_to, "%Y-%m-%d").date()
-                q = q.filter(Expense.date <= dto)
+                q = q.filter(Expense.date <= parse_ymd(date_to))
             except Exception:
                 pass
         if category:
-            # join category
-            cat = session.query(Category).filter(func.lower(Category.name)==category.lower()).first()
-            if cat:
-                q = q.filter(Expense.category_id == cat.id)
+            # filter through the join so it fuses into one plan with the eager load
+            q = q.join(Category).filter(func.lower(Category.name) == category.lower())
+
+        if stream:
+            def _iter_rows(query=q.limit(per_page)):
+                for e in query.yield_per(1000):
+                    yield ExpenseRow(e.id, from_cents(e.amount_cents), e.currency,
+                                     e.category_obj.name if e.category_obj else "",
+                                     e.date.isoformat() if e.date else "",
+                                     _note_view(e.note))
+            return {"total": None, "pages": None, "page": 1,
+                    "per_page": per_page, "items": _iter_rows()}
+
+        if with_total:
+            q = q.add_columns(func.count().over().label("total_cnt"))
+            page_rows = q.offset((page-1)*per_page).limit(per_page).all()
+            items = [r[0] for r in page_rows]
+            if page_rows:
+                total = page_rows[0][1]
             else:
-                return {"total":0,"pages":0,"page":1,"per_page":per_page,"items":[]}
-
-        total = q.count()
-        pages = math.ceil(total / per_page) if per_page else 1
-        items = q.offset((page-1)*per_page).limit(per_page).all()
+                total = q.count() if page > 1 else 0
+            pages = math.ceil(total / per_page) if per_page else 1
+        else:
+            items = q.offset((page-1)*per_page).limit(per_page).all()
+            total = None
+            pages = None
         rows = []
-        for e in items:
-            cat_name = ""
-            if e.category_id:
-                c = session.get(Category, e.category_id)
-                cat_name = c.name if c else ""
-            note_plain = decrypt_note(e.note) if ENCRYPT_NOTES else (e.note or "")
-            rows.append({
-                "id": e.id, "amount": e.amount, "currency": e.currency,
-                "category": cat_name, "date": e.date.isoformat() if e.date else "", "note": note_plain
-            })
+        notes = batch_decrypt(e.note for e in items)
+        for e, note_plain in zip(items, notes):
+            cat_name = e.category_obj.name if e.category_obj else ""
+            rows.append(ExpenseRow(e.id, from_cents(e.amount_cents), e.currency,
+                                   cat_name, e.date.isoformat() if e.date else "",
+                                   note_plain))
         return {"total":total,"pages":pages,"page":page,"per_page":per_page,"items":rows}
 
     except SQLAlchemyError as exc:
         console.print(f"[red]DB error: {exc}[/red]")
         return {"total":0,"pages":0,"page":1,"per_page":per_page,"items":[]}
-    finally:
-        session.close()
 
 # ---------- Analytics ----------
-def spending_trend(period_days: int = 30):
+def spending_trend(period_days: int = 30, session=None):
     """Return daily totals for last period_days days (list of (date,total))."""
-    session = SessionLocal()
-    try:
-        today = datetime.date.today()
-        start = today - datetime.timedelta(days=period_days-1)
-        rows = session.query(Expense.date, func.sum(Expense.amount)).filter(
-            Expense.deleted==False,
-            Expense.date >= start,
-            Expense.date <= today
-        ).group_by(Expense.date).order_by(Expense.date).all()
-        # produce continuous list
-        totals_map = {r[0].isoformat(): float(r[1]) for r in rows}
-        result = []
-        for i in range(period_days):
-            d = (start + datetime.timedelta(days=i)).isoformat()
-            result.append((d, totals_map.get(d, 0.0)))
-        return result
-    finally:
-        session.close()
+    session = session or SESSION
+    today = datetime.date.today()
+    start = today - datetime.timedelta(days=period_days-1)
+    rows = session.execute(_STMT_TREND, {"s": start, "e": today}).all()
+    # produce continuous list; keyed on date objects so only the final
+    # output pays for isoformat, once per day
+    totals_map = {r[0]: from_cents(r[1]) for r in rows}
+    one_day = datetime.timedelta(days=1)
+    return [((d := start + i * one_day).isoformat(), totals_map.get(d, 0.0))
+            for i in range(period_days)]
+
+def monthly_totals(months: int = 12, session=None):
+    """Return (YYYY-MM, total) for the last `months` months.
+
+    Bucketing happens in SQL via strftime, so only one row per month
+    crosses the DB boundary regardless of expense count.
+    """
+    session = session or SESSION
+    today = datetime.date.today()
+    m = today.year * 12 + (today.month - 1) - (months - 1)
+    start = datetime.date(m // 12, m % 12 + 1, 1)
+    rows = session.execute(_STMT_MONTHLY_TOTALS, {"s": start, "e": today}).all()
+    return [(month, from_cents(cents)) for month, cents in rows]
 
 # ---------- Exports (Excel + PDF with charts) ----------
+EXPORT_HEADERS = ("ID", "Amount", "Currency", "Category", "Date", "Note")
+
+
+def render_trend_png(totals, path, width=800, height=250):
+    """Rasterize the trend series as a simple polyline PNG.
+
+    A 30-point line chart does not need matplotlib's figure machinery;
+    drawing it directly with Pillow avoids ~150ms of import/draw overhead
+    per export.
+    """
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    n = len(totals)
+    mx = max(totals, default=0) or 1
+    if n > 1:
+        # constant scale factors hoisted out of the per-point transform
+        sx = (width - 20) / (n - 1)
+        sy = (height - 30) / mx
+        pts = [(10 + int(i * sx), (height - 10) - int(t * sy))
+               for i, t in enumerate(totals)]
+        draw.line(pts, fill="black", width=1)
+        for x, y in pts:
+            draw.ellipse((x - 2, y - 2, x + 2, y + 2), fill="black")
+    img.save(path, "PNG")
+
+
+_CHART_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "expense-tracker")
+
+
+def trend_chart_path(period_days=30, width=800, height=250, session=None):
+    """Return a cached PNG of the spending trend, rendering only on miss.
+
+    The cache key hashes the chart parameters, today's date and a data
+    signature that every mutation moves: the newest expense id (inserts),
+    the newest history id (updates and soft deletes both write history)
+    and the live row count (hard deletes). Repeated exports of unchanged
+    data reuse the file; any change re-renders.
+    """
+    session = session or SESSION
+    sig = session.execute(select(
+        select(func.coalesce(func.max(Expense.id), 0)).scalar_subquery(),
+        select(func.coalesce(func.max(ExpenseHistory.id), 0)).scalar_subquery(),
+        select(func.count()).select_from(Expense).where(Expense.deleted == False).scalar_subquery(),
+    )).one()
+    raw = f"{period_days}:{width}:{height}:{datetime.date.today()}:{sig[0]}:{sig[1]}:{sig[2]}"
+    key = hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+    path = os.path.join(_CHART_CACHE_DIR, f"{key}.png")
+    if not os.path.exists(path):
+        os.makedirs(_CHART_CACHE_DIR, exist_ok=True)
+        totals = [t for _, t in spending_trend(period_days, session=session)]
+        render_trend_png(totals, path, width=width, height=height)
+    return path
+
+
 def export_to_excel_rows(rows, filename=None):
-    if not rows:
-        console.print("[yellow]No data to export.[/yellow]")
+    # peek one row so lazy generators work without materializing
+    rows = iter(rows or ())
+    first = next(rows, None)
+    if first is None:
+        console.print(_MSG_NO_DATA)
         return
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Expenses"
-    headers = ["ID", "Amount", "Currency", "Category", "Date", "Note"]
-    ws.append(headers)
-    for r in rows:
-        ws.append([r.get("id"), float(r.get("amount",0)), r.get("currency",""), r.get("category",""), r.get("date",""), r.get("note","")])
+    # write-only mode streams rows to disk instead of keeping styled Cell
+    # objects in memory — matters on the export-all path (thousands of rows)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Expenses")
+    ws.append(EXPORT_HEADERS)
+    # ExpenseRow's field order matches EXPORT_HEADERS, so the leading
+    # slice is the sheet row — no per-cell attribute lookups or rebuild
+    for r in chain((first,), rows):
+        ws.append(r[:6])
     if not filename:
         filename = f"expenses_export_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
     try:
@@ -449,8 +896,12 @@ def export_to_excel_rows(rows, filename=None):
 from fpdf.enums import XPos, YPos  # add this at the top of your imports
 
 def export_to_pdf_rows(rows, filename=None, embed_chart=False, chart_days=30):
-    if not rows and not embed_chart:
-        console.print("[yellow]No data to export.[/yellow]")
+    # accept any iterable (list or streaming generator) — peek one row
+    # instead of materializing, so export-all memory stays flat
+    rows = iter(rows or ())
+    first = next(rows, None)
+    if first is None and not embed_chart:
+        console.print(_MSG_NO_DATA)
         return
     if not filename:
         filename = f"expenses_report_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
@@ -465,49 +916,26 @@ def export_to_pdf_rows(rows, filename=None, embed_chart=False, chart_days=30):
     pdf.cell(0, 10, title, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align="C")
     pdf.ln(5)
 
-    if rows:
-        # ---------- Table Header ----------
-        pdf.set_font("Helvetica", "B", 10)
-        pdf.cell(15, 8, "ID", border=1)
-        pdf.cell(30, 8, "Amount", border=1)
-        pdf.cell(25, 8, "Curr", border=1)
-        pdf.cell(40, 8, "Category", border=1)
-        pdf.cell(25, 8, "Date", border=1)
-        pdf.cell(55, 8, "Note", border=1)
-        pdf.ln()
-
-        # ---------- Table Rows ----------
+    if first is not None:
+        # ---------- Table ----------
+        # fpdf2's table context computes column widths once and lays out
+        # whole rows, instead of six pdf.cell() calls per expense
         pdf.set_font("Helvetica", size=9)
-        for r in rows:
-            note = r.get("note","") or ""
-            pdf.cell(15, 8, str(r.get("id","")), border=1)
-            pdf.cell(30, 8, f"Rs.{float(r.get('amount',0)):.2f}", border=1)
-            pdf.cell(25, 8, str(r.get("currency","")), border=1)
-            pdf.cell(40, 8, str(r.get("category",""))[:20], border=1)
-            pdf.cell(25, 8, str(r.get("date","")), border=1)
-            pdf.cell(55, 8, note[:40], border=1)
-            pdf.ln()
+        with pdf.table(col_widths=(15, 30, 25, 40, 25, 55), line_height=8) as table:
+            table.row(("ID", "Amount", "Curr", "Category", "Date", "Note"))
+            for r in chain((first,), rows):
+                table.row((str(r.id),
+                           f"Rs.{float(r.amount):.2f}",
+                           r.currency or "",
+                           (r.category or "")[:20],
+                           r.date or "",
+                           (r.note or "")[:40]))
 
     # ---------- Optional Trend Chart ----------
     if embed_chart:
-        trend = spending_trend(period_days=chart_days)
-        dates = [t[0] for t in trend]
-        totals = [t[1] for t in trend]
-        tmpfile = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-        plt.figure(figsize=(8,2.5))
-        plt.plot(dates, totals, marker='o', linewidth=1)
-        plt.xticks(rotation=45, fontsize=6)
-        plt.tight_layout()
-        plt.savefig(tmpfile.name, dpi=150)
-        plt.close()
-
+        chart = trend_chart_path(period_days=chart_days)
         pdf.add_page()
-        pdf.image(tmpfile.name, x=15, w=180)
-
-        try:
-            os.unlink(tmpfile.name)
-        except:
-            pass
+        pdf.image(chart, x=15, w=180)
 
     try:
         pdf.output(filename)
@@ -516,13 +944,29 @@ def export_to_pdf_rows(rows, filename=None, embed_chart=False, chart_days=30):
         console.print(f"[red]Failed to save PDF: {ex}[/red]")
 
 
+def export_all(rows, excel_filename=None, pdf_filename=None, embed_chart=False):
+    """Write the Excel and PDF exports concurrently.
+
+    Both writers are dominated by file I/O, so running them in two
+    threads roughly halves the wall time of a combined export. The rows
+    are materialized once up front because each writer needs its own
+    pass over them.
+    """
+    rows = list(rows or ())
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = (pool.submit(export_to_excel_rows, rows, excel_filename),
+                   pool.submit(export_to_pdf_rows, rows, pdf_filename, embed_chart))
+        for fut in futures:
+            fut.result()
+
+
 # ---------- CLI Helpers ----------
 def prompt_add():
     amount = Prompt.ask("Amount (₹)")
     try:
         amt = float(amount)
     except:
-        console.print("[red]Invalid amount[/red]")
+        console.print(_MSG_INVALID_AMOUNT)
         return
     note = Prompt.ask("Note", default="")
     date = Prompt.ask("Date (YYYY-MM-DD) or Enter", default="")
@@ -534,23 +978,35 @@ def prompt_add():
     add_expense_db(amt, note, date_valid, category, currency)
 
 def prompt_view():
-    page = int(Prompt.ask("Page", default="1"))
     per_page = int(Prompt.ask("Per page", default="20"))
     sort = Prompt.ask("Sort by", choices=["date","amount","id"], default="date")
     desc = Confirm.ask("Descending?", default=True)
-    res = view_expenses_db(page=page, per_page=per_page, sort_by=sort, desc=desc)
-    table = Table(box=box.SIMPLE, show_header=True, header_style="bold magenta")
-    table.add_column("No.", style="dim", width=5, justify="right")
-    table.add_column("ID", style="cyan", width=6)
-    table.add_column("Amount (₹)", justify="right")
-    table.add_column("Curr")
-    table.add_column("Category")
-    table.add_column("Date")
-    table.add_column("Note")
-    for idx, it in enumerate(res["items"], start=1 + (res["page"]-1)*res["per_page"]):
-        table.add_row(str(idx), str(it["id"]), f"{float(it['amount']):.2f}", it.get("currency",""), it.get("category",""), it.get("date",""), str(it.get("note",""))[:40])
-    console.print(table)
-    console.print(f"Page {res['page']}/{res['pages']} — total {res['total']}")
+    page_no = 1
+    after = None
+    total = None
+    while True:
+        # date sort pages by keyset token; other sorts fall back to OFFSET
+        res = view_expenses_db(page=page_no, per_page=per_page, sort_by=sort,
+                               desc=desc, after=after)
+        if total is None:
+            total = res["total"]
+        table = Table(box=box.SIMPLE, show_header=True, header_style="bold magenta")
+        table.add_column("No.", style="dim", width=5, justify="right")
+        table.add_column("ID", style="cyan", width=6)
+        table.add_column("Amount (₹)", justify="right")
+        table.add_column("Curr")
+        table.add_column("Category")
+        table.add_column("Date")
+        table.add_column("Note")
+        for idx, it in enumerate(res["items"], start=1 + (page_no-1)*per_page):
+            table.add_row(str(idx), str(it.id), f"{float(it.amount):.2f}", it.currency or "", it.category or "", it.date or "", str(it.note or "")[:40])
+        console.print(table)
+        console.print(f"Page {page_no} — total {total}")
+        has_more = len(res["items"]) == per_page and page_no * per_page < total
+        if not has_more or not Confirm.ask("Next page?", default=False):
+            break
+        page_no += 1
+        after = res["next_after"] if sort == "date" else None
 
 def prompt_delete():
     eid = int(Prompt.ask("Expense ID to soft-delete"))
@@ -587,48 +1043,51 @@ def prompt_search_export():
                          category=cat or None, page=page, per_page=per)
     # export
     if not res["items"]:
-        console.print("[yellow]No results[/yellow]")
+        console.print(_MSG_NO_RESULTS)
         return
     # ask export options
     ex = Prompt.ask("Export as (none/excel/pdf/both)", choices=["none","excel","pdf","both"], default="none")
-    if ex in ("excel","both"):
+    if ex == "both":
+        embed = Confirm.ask("Embed trend chart in PDF?", default=True)
+        export_all(res["items"], embed_chart=embed)
+    elif ex == "excel":
         export_to_excel_rows(res["items"])
-    if ex in ("pdf","both"):
+    elif ex == "pdf":
         embed = Confirm.ask("Embed trend chart in PDF?", default=True)
         export_to_pdf_rows(res["items"], embed_chart=embed)
 
-def monthly_category_summary():
+def monthly_category_summary(session=None):
     """Print monthly total per category for current month."""
-    session = SessionLocal()
+    session = session or SESSION
     try:
         today = datetime.date.today()
-        month_start = today.replace(day=1)
-        import calendar
-        last_day = calendar.monthrange(today.year, today.month)[1]
-        month_end = today.replace(day=last_day)
-
-        # query totals per category
-        results = session.query(
-            Category.name,
-            func.sum(Expense.amount)
-        ).join(Expense, Expense.category_id==Category.id)\
-         .filter(Expense.deleted==False,
-                 Expense.date >= month_start,
-                 Expense.date <= month_end)\
-         .group_by(Category.id)\
-         .order_by(Category.name).all()
+        month_start, month_end = month_bounds(today)
+
+        # per-category totals plus the grand total in a single round trip;
+        # the NULL-name row carries the month total (SQLite has no ROLLUP)
+        per_cat = select(Category.name.label("name"), func.sum(Expense.amount_cents).label("total"))\
+            .join(Expense, Expense.category_id == Category.id)\
+            .where(Expense.deleted == False,
+                   Expense.date.between(month_start, month_end))\
+            .group_by(Category.id)
+        grand = select(literal(None).label("name"), func.sum(Expense.amount_cents).label("total"))\
+            .where(Expense.deleted == False,
+                   Expense.date.between(month_start, month_end))
+        results = session.execute(union_all(per_cat, grand).order_by(text("name"))).all()
 
         table = Table(title=f"Category Totals - {today.strftime('%B %Y')}", box=box.SIMPLE, show_header=True, header_style="bold magenta")
         table.add_column("Category")
         table.add_column("Total (₹)", justify="right")
         total_month = 0.0
         for cat, amt in results:
-            total_month += amt or 0.0
-            table.add_row(cat, f"{amt or 0.0:.2f}")
+            if cat is None:
+                total_month = from_cents(amt)
+            else:
+                table.add_row(cat, f"{from_cents(amt):.2f}")
         console.print(table)
         console.print(f"[cyan]Total all categories: ₹{total_month:.2f}[/cyan]")
-    finally:
-        session.close()
+    except SQLAlchemyError as exc:
+        console.print(f"[red]DB error: {exc}[/red]")
 
 
 def prompt_budget():
@@ -637,10 +1096,10 @@ def prompt_budget():
     try:
         amt = float(Prompt.ask("Monthly budget amount (₹)"))
     except:
-        console.print("[red]Invalid amount[/red]")
+        console.print(_MSG_INVALID_AMOUNT)
         return
     curr = Prompt.ask("Currency", default="INR")
-    session = SessionLocal()
+    session = SESSION
     try:
         c = create_category_if_missing(session, cat)
         # upsert budget (one budget per category used here)
@@ -652,16 +1111,19 @@ def prompt_budget():
             b = Budget(category_id=c.id, amount=amt, currency=curr)
             session.add(b)
         session.commit()
+        _BUDGET_CACHE[c.id] = amt
         console.print(f"[green]Budget set for {c.name}: ₹{amt:.2f} {curr}[/green]")
     except Exception as exc:
         session.rollback()
         console.print(f"[red]Error: {exc}[/red]")
-    finally:
-        session.close()
 
 def prompt_trend():
     days = int(Prompt.ask("Days for trend", default="30"))
-    data = spending_trend(days)
+    # beyond ~3 months a daily table is noise; bucket by month in SQL
+    if days > 92:
+        data = monthly_totals(months=max(1, round(days / 30)))
+    else:
+        data = spending_trend(days)
     # simple ASCII table
     table = Table(show_header=True, header_style="bold magenta")
     table.add_column("Date")
@@ -669,110 +1131,107 @@ def prompt_trend():
     for d,t in data:
         table.add_row(d, f"{t:.2f}")
     console.print(table)
-    # show small line chart using matplotlib inline popup saved to temp file
+    # chart comes from the on-disk cache; re-rendered only when data changed
     if Confirm.ask("Show chart image and export to PDF?", default=True):
-        tmp = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-        dates = [d for d,_ in data]
-        totals = [t for _,t in data]
-        plt.figure(figsize=(8,2.5))
-        plt.plot(dates, totals, marker='o', linewidth=1)
-        plt.xticks(rotation=45, fontsize=6)
-        plt.tight_layout()
-        plt.savefig(tmp.name, dpi=150)
-        plt.close()
-        console.print(f"[green]Chart saved to {tmp.name}[/green]")
+        chart = trend_chart_path(period_days=days)
+        console.print(f"[green]Chart saved to {chart}[/green]")
         if Confirm.ask("Attach chart to new PDF report?", default=True):
             # generate PDF with chart only
-            export_to_pdf_rows([], filename=f"trend_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf", embed_chart=True)
+            export_to_pdf_rows([], filename=f"trend_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf", embed_chart=True, chart_days=days)
 
 # ---------- Main Menu ----------
+def _menu_monthly_total():
+    now = datetime.date.today()
+    s = SESSION.execute(
+        _STMT_MONTH_SUM, {"s": now.replace(day=1), "e": now}
+    ).scalar() or 0
+    console.print(Panel(f"Total this month: ₹{from_cents(s):.2f}", style="cyan"))
+
+def _menu_filter_category():
+    cat = Prompt.ask("Category").strip()
+    res = search_expenses(category=cat, per_page=1000)
+    if res["items"]:
+        export = Confirm.ask("Export results?", default=False)
+        show_table = Table(box=box.SIMPLE)
+        show_table.add_column("ID"); show_table.add_column("Amount"); show_table.add_column("Category"); show_table.add_column("Date"); show_table.add_column("Note")
+        for r in res["items"]:
+            show_table.add_row(str(r.id), f"{r.amount:.2f}", r.category, r.date, str(r.note)[:30])
+        console.print(show_table)
+        if export:
+            ex = Prompt.ask("Export as excel/pdf/both/none", choices=["excel","pdf","both","none"], default="none")
+            if ex in ("excel","both"):
+                export_to_excel_rows(res["items"])
+            if ex in ("pdf","both"):
+                export_to_pdf_rows(res["items"], embed_chart=True)
+    else:
+        console.print(_MSG_NO_ITEMS)
+
+def _menu_filter_date():
+    date = Prompt.ask("Date (YYYY-MM-DD)")
+    d = valid_date_str(date)
+    if not d:
+        console.print("[red]Invalid date[/red]")
+        return
+    res = search_expenses(date_from=d, date_to=d, per_page=1000)
+    if res["items"]:
+        export_to_excel_rows(res["items"])
+    else:
+        console.print("[yellow]No items on that date[/yellow]")
+
+def _menu_export_all_excel():
+    res = search_expenses(per_page=10000, stream=True)
+    export_to_excel_rows(res["items"])
+
+def _menu_export_all_pdf():
+    res = search_expenses(per_page=10000, stream=True)
+    export_to_pdf_rows(res["items"], embed_chart=True)
+
+MENU_LINES = (
+    "1. Add Expense",
+    "2. View Expenses (pagination)",
+    "3. Soft Delete Expense",
+    "4. Update Expense",
+    "5. Monthly Total",
+    "6. Monthly Category Breakdown",
+    "7. Filter by Category",
+    "8. Filter by Date",
+    "9. Search & Export",
+    "10. Set Category Budget",
+    "11. Spending Trend (days)",
+    "12. Export All to Excel",
+    "13. Export All to PDF (with chart)",
+    "14. Exit",
+)
+
+# O(1) dispatch instead of the elif ladder; handlers can be extended or
+# wrapped (e.g. with a profiler) without touching the loop
+HANDLERS = {
+    "1": prompt_add,
+    "2": prompt_view,
+    "3": prompt_delete,
+    "4": prompt_update,
+    "5": _menu_monthly_total,
+    "6": monthly_category_summary,
+    "7": _menu_filter_category,
+    "8": _menu_filter_date,
+    "9": prompt_search_export,
+    "10": prompt_budget,
+    "11": prompt_trend,
+    "12": _menu_export_all_excel,
+    "13": _menu_export_all_pdf,
+}
+
 def main_menu():
     while True:
-        console.print(Panel("Expense Manager PRO (SQLite + SQLAlchemy)", style="bold white on blue"))
-        console.print("1. Add Expense")
-        console.print("2. View Expenses (pagination)")
-        console.print("3. Soft Delete Expense")
-        console.print("4. Update Expense")
-        console.print("5. Monthly Total")
-        console.print("6. Monthly Category Breakdown")
-        console.print("7. Filter by Category")
-        console.print("8. Filter by Date")
-        console.print("9. Search & Export")
-        console.print("10. Set Category Budget")
-        console.print("11. Spending Trend (days)")
-        console.print("12. Export All to Excel")
-        console.print("13. Export All to PDF (with chart)")
-        console.print("14. Exit")
+        console.print(_MENU_PANEL)
+        for line in MENU_LINES:
+            console.print(line)
 
         choice = Prompt.ask("Choose", choices=[str(i) for i in range(1,15)])
-        if choice == "1":
-            prompt_add()
-        elif choice == "2":
-            prompt_view()
-        elif choice == "3":
-            prompt_delete()
-        elif choice == "4":
-            prompt_update()
-        elif choice == "5":
-            # monthly total
-            session = SessionLocal()
-            try:
-                now = datetime.date.today()
-                s = session.query(func.sum(Expense.amount)).filter(
-                    Expense.deleted==False,
-                    Expense.date >= now.replace(day=1),
-                    Expense.date <= now
-                ).scalar() or 0.0
-                console.print(Panel(f"Total this month: ₹{float(s):.2f}", style="cyan"))
-            finally:
-                session.close()
-        elif choice == "6":
-            monthly_category_summary()
-        elif choice == "7":
-            cat = Prompt.ask("Category").strip()
-            res = search_expenses(category=cat, per_page=1000)
-            if res["items"]:
-                export = Confirm.ask("Export results?", default=False)
-                show_table = Table(box=box.SIMPLE)
-                show_table.add_column("ID"); show_table.add_column("Amount"); show_table.add_column("Category"); show_table.add_column("Date"); show_table.add_column("Note")
-                for r in res["items"]:
-                    show_table.add_row(str(r["id"]), f"{r['amount']:.2f}", r['category'], r['date'], str(r['note'])[:30])
-                console.print(show_table)
-                if export:
-                    ex = Prompt.ask("Export as excel/pdf/both/none", choices=["excel","pdf","both","none"], default="none")
-                    if ex in ("excel","both"):
-                        export_to_excel_rows(res["items"])
-                    if ex in ("pdf","both"):
-                        export_to_pdf_rows(res["items"], embed_chart=True)
-            else:
-                console.print("[yellow]No items[/yellow]")
-        elif choice == "8":
-            date = Prompt.ask("Date (YYYY-MM-DD)")
-            d = valid_date_str(date)
-            if not d:
-                console.print("[red]Invalid date[/red]")
-            else:
-                res = search_expenses(date_from=d, date_to=d, per_page=1000)
-                if res["items"]:
-                    export_to_excel_rows(res["items"])
-                else:
-                    console.print("[yellow]No items on that date[/yellow]")
-        elif choice == "9":
-            prompt_search_export()
-        elif choice == "10":
-            prompt_budget()
-        elif choice == "11":
-            prompt_trend()
-        elif choice == "12":
-            # export all
-            res = search_expenses(per_page=10000)
-            export_to_excel_rows(res["items"])
-        elif choice == "13":
-            res = search_expenses(per_page=10000)
-            export_to_pdf_rows(res["items"], embed_chart=True)
-        elif choice == "14":
-            console.print("[green]Goodbye[/green]")
+        if choice == "14":
+            console.print(_MSG_BYE)
             break
+        HANDLERS[choice]()
 
 if __name__ == "__main__":
     try:
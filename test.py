@@ -3,15 +3,19 @@ import os
 import sys
 import datetime
 from main import (
-    add_expense_db, view_expenses_db, update_expense_db, delete_expense_db,
-    search_expenses, export_to_excel_rows, export_to_pdf_rows,
+    add_expense_db, add_expenses_bulk, view_expenses_db, update_expense_db,
+    delete_expense_db, search_expenses, export_all,
     create_category_if_missing, SessionLocal, Budget, Category
 )
 
 def test_add_expenses():
-    print("Testing add_expense_db...")
-    for i in range(5):
-        add_expense_db(amount=100+i*10, note=f"Test note {i}", date_str=datetime.date.today().isoformat(), category_name="Food")
+    print("Testing add_expenses_bulk...")
+    today = datetime.date.today().isoformat()
+    n = add_expenses_bulk([
+        {"amount": 100+i*10, "note": f"Test note {i}", "date_str": today, "category_name": "Food"}
+        for i in range(5)
+    ])
+    assert n == 5, f"Expected 5 inserts, got {n}"
     print("✔ Add expenses test passed.")
 
 def test_view_expenses():
@@ -26,7 +30,7 @@ def test_update_delete_expenses():
     if not res["items"]:
         print("No items to test update/delete")
         return
-    eid = res["items"][0]["id"]
+    eid = res["items"][0].id
     update_expense_db(eid, amount=999)
     delete_expense_db(eid, soft=True)
     delete_expense_db(eid, soft=False)
@@ -65,21 +69,16 @@ def test_set_category_budget():
 
 def test_search_expenses():
     print("Testing search_expenses...")
-    res = search_expenses(keyword="Test")
+    res = search_expenses(keyword="Test", with_total=True)
     assert res["total"] >= 0, "Search failed"
     print("✔ Search expenses test passed.")
 
-def test_export_excel():
-    print("Testing export_to_excel_rows...")
+def test_exports():
+    print("Testing export_all...")
+    # fetch once; export_all hands the same rows to both writers
     res = view_expenses_db(per_page=100)
-    export_to_excel_rows(res["items"], filename="test_export.xlsx")
-    print("✔ Excel export test passed.")
-
-def test_export_pdf():
-    print("Testing export_to_pdf_rows...")
-    res = view_expenses_db(per_page=100)
-    export_to_pdf_rows(res["items"], filename="test_export.pdf", embed_chart=False)
-    print("✔ PDF export test passed.")
+    export_all(res["items"], excel_filename="test_export.xlsx", pdf_filename="test_export.pdf")
+    print("✔ Export test passed.")
 
 def run_all_tests():
     test_add_expenses()
@@ -89,8 +88,7 @@ def run_all_tests():
     test_category_breakdown()
     test_set_category_budget()
     test_search_expenses()
-    test_export_excel()
-    test_export_pdf()
+    test_exports()
     print("\nAll tests passed!")
 
 if __name__ == "__main__":